@@ -1,19 +1,28 @@
 """
-rag-cli — Local RAG tool powered by Ollama + ChromaDB + LangChain
+rag-cli — Local RAG tool powered by Ollama + FAISS + LangChain
 
 Commands:
   index   <path>              Index a file or folder
   query   [question]          Ask a question (omit for interactive mode)
   list                        List indexed collections
   clear                       Delete one or all collections
+  speak   <text|file>         Read text or a document aloud
+  compare <question|file>     Run the same question(s) against several models
 """
 
+import contextlib
+import functools
+import importlib
+import os
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Iterator, Optional
 
 import typer
-from rich.console import Console
-from rich.panel import Panel
+
+from rag import config
+
+if TYPE_CHECKING:
+    from rich.console import Console
 
 app = typer.Typer(
     name="rag",
@@ -21,7 +30,22 @@ app = typer.Typer(
     add_completion=False,
     no_args_is_help=True,
 )
-console = Console()
+
+
+# ── lazy imports ──────────────────────────────────────────────────────────────
+# LangChain / FAISS / edge-tts take seconds to import. Commands pull them in on
+# first use so `--help`, `list` and `clear` only pay for typer + rich.
+
+@functools.lru_cache(maxsize=None)
+def _lazy(module: str, attr: str) -> Any:
+    """Import *module* on first use and return its attribute *attr*."""
+    return getattr(importlib.import_module(module), attr)
+
+
+@functools.lru_cache(maxsize=None)
+def _console() -> "Console":
+    from rich.console import Console
+    return Console()
 
 
 # ── index ─────────────────────────────────────────────────────────────────────
@@ -34,7 +58,8 @@ def index(
     ),
 ):
     """Index a document or a whole folder into the vector store."""
-    from rag.indexer import index as do_index
+    console = _console()
+    do_index = _lazy("rag.indexer", "index")
 
     if not path.exists():
         console.print(f"[red]Path not found: {path}[/red]")
@@ -68,31 +93,42 @@ def query(
     tts_voice: Optional[str] = typer.Option(
         None, "--voice", "-V", help="TTS voice name (e.g. it-IT-ElsaNeural)"
     ),
+    no_embed_cache: bool = typer.Option(
+        False, "--no-embed-cache", help="Re-embed every question (disable the query embedding cache)"
+    ),
 ):
     """Ask a question about indexed documents."""
-    from rag import config
-    from rag.chain import query as do_query
+    console = _console()
 
-    if model:
-        config.LLM_MODEL = model
+    # Resolve the effective settings once; they are passed down explicitly
+    # instead of patching config.LLM_MODEL for the rest of the process.
+    collection = collection or config.COLLECTION
+    model = model or config.LLM_MODEL
+    if no_embed_cache:
+        config.EMBED_CACHE = False
+
+    # Get the index and both Ollama models loading while the first question
+    # is embedded (or typed, in the REPL).
+    import threading
+
+    warmup = _lazy("rag.chain", "warmup")
+    threading.Thread(target=warmup, args=(collection, model), daemon=True).start()
 
     if question:
-        answer = do_query(question, collection, show_sources=sources)
+        answer = _ask(question, collection, sources, model, speak, tts_voice)
         if output and answer:
-            _save_output(output, question, answer)
-        if speak and answer:
-            _speak_text(answer, voice=tts_voice)
+            _save_output(output, question, answer, collection=collection, model=model)
         return
 
     # ── interactive REPL ──────────────────────────────────────────────────────
-    from rag import config as cfg  # re-import after possible mutation
+    from rich.panel import Panel
 
     console.print(
         Panel(
             f"[bold]RAG — Interactive Mode[/bold]\n"
-            f"Collection : [cyan]{collection or cfg.COLLECTION}[/cyan]\n"
-            f"LLM        : [cyan]{cfg.LLM_MODEL}[/cyan]\n"
-            f"Embeddings : [cyan]{cfg.EMBED_MODEL}[/cyan]\n\n"
+            f"Collection : [cyan]{collection}[/cyan]\n"
+            f"LLM        : [cyan]{model}[/cyan]\n"
+            f"Embeddings : [cyan]{config.EMBED_MODEL}[/cyan]\n\n"
             f"[dim]Type a question and press Enter. 'exit' or Ctrl-C to quit.[/dim]",
             border_style="blue",
         )
@@ -107,9 +143,10 @@ def query(
             continue
         if q.lower() in ("exit", "quit", "q", ":q"):
             break
-        ans = do_query(q, collection, show_sources=sources)
-        if speak and ans:
-            _speak_text(ans, voice=tts_voice)
+        _ask(q, collection, sources, model, speak, tts_voice)
+        # Re-warm while the user types the next question, in case Ollama
+        # unloaded a model during a long pause.
+        threading.Thread(target=warmup, args=(collection, model), daemon=True).start()
 
     console.print("\n[dim]Bye.[/dim]")
 
@@ -119,36 +156,35 @@ def query(
 @app.command(name="list")
 def list_collections():
     """List all indexed collections and their chunk counts."""
-    import json
-    from rag import config
+    from concurrent.futures import ThreadPoolExecutor
 
+    console = _console()
     if not config.INDEX_DIR.exists():
         console.print("[yellow]No index found. Run 'index' first.[/yellow]")
         return
 
-    collections = sorted(
-        d for d in config.INDEX_DIR.iterdir()
-        if d.is_dir() and (d / "index.faiss").exists()
-    )
+    collections = _collection_dirs()
 
     if not collections:
         console.print("[yellow]No collections found.[/yellow]")
         return
 
+    with ThreadPoolExecutor(max_workers=min(8, len(collections))) as executor:
+        metas = list(executor.map(_read_meta, collections))
+
     console.print("\n[bold]Indexed collections:[/bold]")
-    for col_dir in collections:
-        meta_file = col_dir / "meta.json"
-        if meta_file.exists():
-            meta = json.loads(meta_file.read_text())
+    for col_dir, meta in zip(collections, metas):
+        name = os.path.basename(col_dir)
+        if meta is not None:
             chunks = meta.get("chunks", "?")
             sources = ", ".join(meta.get("sources", []))
             updated = meta.get("updated", "")[:10]
             console.print(
-                f"  [cyan]{col_dir.name}[/cyan]  — {chunks} chunks"
+                f"  [cyan]{name}[/cyan]  — {chunks} chunks"
                 f"  [dim]({sources}) · {updated}[/dim]"
             )
         else:
-            console.print(f"  [cyan]{col_dir.name}[/cyan]")
+            console.print(f"  [cyan]{name}[/cyan]")
 
 
 # ── clear ─────────────────────────────────────────────────────────────────────
@@ -160,9 +196,7 @@ def clear(
     ),
 ):
     """Delete one collection or the entire index."""
-    import shutil
-    from rag import config
-
+    console = _console()
     if not config.INDEX_DIR.exists():
         console.print("[yellow]Nothing to clear.[/yellow]")
         return
@@ -172,22 +206,19 @@ def clear(
         if not col_dir.exists():
             console.print(f"[red]Collection '{collection}' not found.[/red]")
             raise typer.Exit(1)
-        shutil.rmtree(col_dir)
+        _fast_rmtree(col_dir)
         console.print(f"[green]Deleted collection '{collection}'[/green]")
         return
 
-    cols = sorted(
-        d for d in config.INDEX_DIR.iterdir()
-        if d.is_dir() and (d / "index.faiss").exists()
-    )
+    cols = _collection_dirs()
     if not cols:
         console.print("[yellow]Nothing to clear.[/yellow]")
         return
 
-    names = [d.name for d in cols]
+    names = [os.path.basename(d) for d in cols]
     confirmed = typer.confirm(f"Delete ALL collections {names}?", default=False)
     if confirmed:
-        shutil.rmtree(config.INDEX_DIR)
+        _fast_rmtree(config.INDEX_DIR)
         console.print("[green]All collections deleted.[/green]")
     else:
         console.print("[dim]Aborted.[/dim]")
@@ -195,50 +226,189 @@ def clear(
 
 # ── helpers ───────────────────────────────────────────────────────────────────
 
+def _collection_dirs() -> list[str]:
+    """Sorted paths of every collection under INDEX_DIR (one scandir pass)."""
+    with os.scandir(config.INDEX_DIR) as it:
+        return sorted(
+            e.path for e in it
+            if e.is_dir() and os.path.exists(os.path.join(e.path, "index.faiss"))
+        )
+
+
+def _fast_rmtree(path: Path) -> None:
+    """
+    Delete an index directory. On POSIX this hands the walk to ``rm -rf``
+    instead of shutil.rmtree's per-entry Python loop; Windows, or a missing
+    or failing ``rm``, falls back to shutil.rmtree.
+    """
+    if os.name == "posix":
+        import subprocess
+        try:
+            subprocess.run(["rm", "-rf", "--", str(path)], check=True)
+            return
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    import shutil
+    shutil.rmtree(path)
+
+
+def _iter_questions(path: Path) -> Iterator[str]:
+    """Yield the non-blank, stripped lines of a questions file one at a time."""
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+_RESULT_FIELDS = ["question", "model", "answer", "latency_s"]
+
+
+@contextlib.contextmanager
+def _open_results_writer(dest: Optional[Path]):
+    """
+    Yield a ``write_row(dict)`` callable that appends `compare` results to
+    *dest* as they arrive and flushes each one: a JSON array for ``.json``,
+    CSV otherwise. The JSON array is closed even if the run is interrupted.
+    With no *dest*, rows are dropped.
+    """
+    if dest is None:
+        yield lambda row: None
+        return
+
+    if dest.suffix.lower() == ".json":
+        with dest.open("wb") as f:
+            f.write(b"[")
+            first = True
+
+            def write_row(row: dict) -> None:
+                nonlocal first
+                f.write(b"\n  " if first else b",\n  ")
+                f.write(_dump_json(row).replace(b"\n", b"\n  "))
+                f.flush()
+                first = False
+
+            try:
+                yield write_row
+            finally:
+                f.write(b"]\n" if first else b"\n]\n")
+        return
+
+    import csv
+    with dest.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=_RESULT_FIELDS)
+        writer.writeheader()
+
+        def write_row(row: dict) -> None:
+            writer.writerow(row)
+            f.flush()
+
+        yield write_row
+
+
+def _dump_json(data) -> bytes:
+    """Serialize *data* as indented UTF-8 JSON, via orjson when available."""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+
+def _read_meta(col_dir: str) -> Optional[dict]:
+    """Parse a collection's meta.json, or None if it has none."""
+    try:
+        with open(os.path.join(col_dir, "meta.json"), "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.loads(raw)
+    return orjson.loads(raw)
+
+
+_ensured_dirs: set[str] = set()
+
+
 def _resolve_output(path: Path) -> Path:
     """If path has no parent directory (bare filename), place it inside OUTPUT_DIR."""
-    from rag import config
     if path.parent == Path("."):
         out = config.OUTPUT_DIR / path
     else:
         out = path
-    out.parent.mkdir(parents=True, exist_ok=True)
+    # Repeated saves to the same folder skip the mkdir syscall.
+    parent = str(out.parent)
+    if parent not in _ensured_dirs:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(parent)
     return out
 
 
-def _speak_text(text: str, voice: Optional[str] = None) -> None:
-    """Speak *text* using TTS, handling errors gracefully."""
-    from rag import config
-    from rag.tts import speak as do_speak
+def _ask(
+    question: str,
+    collection: str,
+    sources: bool,
+    model: str,
+    speak: bool,
+    voice: Optional[str],
+) -> str:
+    """
+    Run one query. With *speak*, streamed chunks are fed to a SpeechStream so
+    the first sentence is read aloud while the rest is still being generated.
+    TTS errors are reported without failing the query.
+    """
+    do_query = _lazy("rag.chain", "query")
+    if not speak:
+        return do_query(question, collection, show_sources=sources, model=model)
+
+    console = _console()
+    SpeechStream = _lazy("rag.tts", "SpeechStream")
+    speech = SpeechStream(voice=voice, max_chars=config.TTS_MAX_CHARS)
+    try:
+        answer = do_query(
+            question, collection, show_sources=sources, model=model, on_chunk=speech.feed
+        )
+    except BaseException:
+        speech.cancel()
+        raise
 
     try:
-        with console.status("[dim]Synthesizing audio…[/dim]"):
-            do_speak(text, voice=voice, max_chars=config.TTS_MAX_CHARS)
+        speech.close()
     except RuntimeError as e:
         console.print(f"[yellow]TTS unavailable: {e}[/yellow]")
     except KeyboardInterrupt:
+        speech.cancel()
         console.print("\n[dim]TTS stopped.[/dim]")
+    return answer
 
 
-def _save_output(path: Path, question: str, answer: str) -> None:
+def _save_output(
+    path: Path,
+    question: str,
+    answer: str,
+    collection: Optional[str] = None,
+    model: Optional[str] = None,
+) -> None:
     """Write a single Q/A pair to disk in the format implied by the file extension."""
-    from rag import config
     dest = _resolve_output(path)
     suffix = dest.suffix.lower()
     if suffix == ".json":
-        import json
         data = {
             "question": question,
             "answer": answer,
-            "collection": config.COLLECTION,
-            "model": config.LLM_MODEL,
+            "collection": collection or config.COLLECTION,
+            "model": model or config.LLM_MODEL,
         }
-        dest.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        dest.write_bytes(_dump_json(data))
     elif suffix == ".md":
-        dest.write_text(f"## Q\n\n{question}\n\n## A\n\n{answer}\n", encoding="utf-8")
+        dest.write_bytes(f"## Q\n\n{question}\n\n## A\n\n{answer}\n".encode("utf-8"))
     else:
-        dest.write_text(f"Q: {question}\n\nA: {answer}\n", encoding="utf-8")
-    console.print(f"\n[dim]Saved → {dest}[/dim]")
+        dest.write_bytes(f"Q: {question}\n\nA: {answer}\n".encode("utf-8"))
+    _console().print(f"\n[dim]Saved → {dest}[/dim]")
 
 
 # ── speak ─────────────────────────────────────────────────────────────────────
@@ -259,8 +429,9 @@ def speak(
     ),
 ):
     """Read text or a document aloud using TTS (edge-tts neural voices)."""
-    from rag import config
-    from rag.tts import speak as do_speak, extract_text
+    console = _console()
+    do_speak = _lazy("rag.tts", "speak")
+    extract_text = _lazy("rag.tts", "extract_text")
 
     src = Path(source)
     if src.exists() and src.is_file():
@@ -314,60 +485,105 @@ def compare(
     output: Optional[Path] = typer.Option(
         None, "--output", "-o", help="Save results to file (.csv or .json)"
     ),
+    no_embed_cache: bool = typer.Option(
+        False, "--no-embed-cache", help="Re-embed every question for every model"
+    ),
 ):
     """Run the same question(s) against multiple models and compare outputs."""
-    import csv
-    import json
-    from rag import config
-    from rag.chain import run_silent
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    console = _console()
+    run_silent = _lazy("rag.chain", "run_silent")
+
+    if no_embed_cache:
+        config.EMBED_CACHE = False
 
     model_list = [m.strip() for m in models.split(",") if m.strip()]
     if not model_list:
         console.print("[red]No models specified.[/red]")
         raise typer.Exit(1)
 
-    # Accept a question string or a file of questions (one per line)
+    # Accept a question string or a file of questions (one per line).
+    # The file is streamed line by line rather than read into memory.
     source = Path(question_or_file)
     if source.exists() and source.is_file():
-        questions = [q.strip() for q in source.read_text(encoding="utf-8").splitlines() if q.strip()]
+        questions = _iter_questions(source)
     else:
-        questions = [question_or_file]
+        questions = iter([question_or_file])
 
     collection = collection or config.COLLECTION
-    results: list[dict] = []
+    dest = _resolve_output(output) if output else None
 
-    for question in questions:
-        console.print(f"\n[bold blue]Q:[/bold blue] {question}")
-        for model in model_list:
-            with console.status(f"[dim]{model}…[/dim]"):
-                try:
-                    answer, elapsed = run_silent(question, collection, model=model)
-                except Exception as e:
-                    answer, elapsed = f"ERROR: {e}", 0.0
-            preview = answer[:200] + ("…" if len(answer) > 200 else "")
-            console.print(f"  [cyan]{model}[/cyan] [dim]({elapsed:.1f}s)[/dim]  {preview}")
-            results.append({
+    def show(model: str, answer: str, elapsed: float) -> None:
+        preview = answer[:200] + ("…" if len(answer) > 200 else "")
+        console.print(f"  [cyan]{model}[/cyan] [dim]({elapsed:.1f}s)[/dim]  {preview}")
+
+    # Rows are written as soon as they are known: an interrupted run keeps the
+    # results it already has, and on the Ollama path memory stays flat however
+    # many questions × models there are.
+    with _open_results_writer(dest) as write_row:
+
+        def record(question: str, model: str, answer: str, elapsed: float) -> None:
+            write_row({
                 "question": question,
                 "model": model,
                 "answer": answer,
                 "latency_s": round(elapsed, 2),
             })
 
-    if not output:
-        return
-
-    dest = _resolve_output(output)
-    suffix = dest.suffix.lower()
-    if suffix == ".json":
-        dest.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
-    else:
-        # Default: CSV
-        with dest.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["question", "model", "answer", "latency_s"])
-            writer.writeheader()
-            writer.writerows(results)
+        if config.OPENAI_BASE_URL:
+            # OpenAI-compatible server (vLLM, …): submit every (question, model)
+            # pair at once and let the server batch them. A question is shown
+            # and written, in model order, as soon as all its models answered.
+            run_batch = _lazy("rag.chain", "run_batch")
+            pairs = [(q, m) for q in questions for m in model_list]
+            partial: dict[int, dict[int, tuple[str, float]]] = {}
+
+            def on_result(i: int, answer: str, elapsed: float) -> None:
+                q_index, m_index = divmod(i, len(model_list))
+                answers = partial.setdefault(q_index, {})
+                answers[m_index] = (answer, elapsed)
+                if len(answers) < len(model_list):
+                    return
+                del partial[q_index]
+                question = pairs[i][0]
+                console.print(f"\n[bold blue]Q:[/bold blue] {question}")
+                for m_index, model in enumerate(model_list):
+                    show(model, *answers[m_index])
+                    record(question, model, *answers[m_index])
+
+            with console.status(f"[dim]{len(pairs)} requests → {config.OPENAI_BASE_URL}…[/dim]"):
+                try:
+                    run_batch(pairs, on_result, collection)
+                except (FileNotFoundError, RuntimeError) as e:
+                    console.print(f"[red]{e}[/red]")
+                    raise typer.Exit(1)
+        else:
+            # Models are queried concurrently: each call is I/O-bound on the
+            # Ollama HTTP socket, so per-question wall time tends towards the
+            # slowest model rather than the sum. Rich output stays on this thread.
+            with ThreadPoolExecutor(max_workers=len(model_list)) as executor:
+                for question in questions:
+                    console.print(f"\n[bold blue]Q:[/bold blue] {question}")
+                    futures = {
+                        executor.submit(run_silent, question, collection, model=model): model
+                        for model in model_list
+                    }
+                    answers: dict[str, tuple[str, float]] = {}
+                    with console.status(f"[dim]{', '.join(model_list)}…[/dim]"):
+                        for future in as_completed(futures):
+                            model = futures[future]
+                            try:
+                                answer, elapsed = future.result()
+                            except Exception as e:
+                                answer, elapsed = f"ERROR: {e}", 0.0
+                            answers[model] = (answer, elapsed)
+                            show(model, answer, elapsed)
+                    for model in model_list:
+                        record(question, model, *answers.pop(model))
 
-    console.print(f"\n[bold green]✓ Results saved to {dest}[/bold green]")
+    if dest:
+        console.print(f"\n[bold green]✓ Results saved to {dest}[/bold green]")
 
 
 # ── entrypoint ────────────────────────────────────────────────────────────────
@@ -1,9 +1,20 @@
+import asyncio
+import functools
+import pickle
+import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
 
+import faiss
 from langchain_ollama import OllamaEmbeddings, ChatOllama
 from langchain_community.vectorstores import FAISS
+from langchain_core.messages import HumanMessage
+from langchain_core.prompt_values import ChatPromptValue
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from rich.console import Console
 
@@ -11,8 +22,7 @@ from . import config
 
 console = Console()
 
-_PROMPT = ChatPromptTemplate.from_template(
-    """You are a helpful assistant. Answer the question using ONLY the context provided below.
+_TEMPLATE = """You are a helpful assistant. Answer the question using ONLY the context provided below.
 If the context does not contain enough information, say so clearly — do not make things up.
 
 Context:
@@ -21,52 +31,330 @@ Context:
 Question: {question}
 
 Answer:"""
-)
+
+_PROMPT = ChatPromptTemplate.from_template(_TEMPLATE)
+
+# The same template pre-split around its two variables, for _render_prompt.
+_HEAD, _REST = _TEMPLATE.split("{context}")
+_MID, _TAIL = _REST.split("{question}")
+
+
+def _render_prompt(context: str, question: str) -> str:
+    """Fill _TEMPLATE by plain concatenation (no template parsing per call)."""
+    return _HEAD + context + _MID + question + _TAIL
+
+
+def _fast_prompt(inputs: dict) -> ChatPromptValue:
+    """
+    Drop-in for _PROMPT in the chain: builds the single human message directly,
+    skipping ChatPromptTemplate's input validation and message formatting.
+    """
+    return ChatPromptValue(
+        messages=[HumanMessage(content=_render_prompt(inputs["context"], inputs["question"]))]
+    )
+
+
+class _TokenStreamer:
+    """
+    Echo streamed tokens to stdout in small batches rather than one
+    print(flush=True) per token. Tokens are encoded once into a byte buffer
+    that is written straight to ``sys.stdout.buffer`` on newline, once it
+    reaches FLUSH_BYTES, or when FLUSH_NS has passed since the last write.
+    """
+
+    FLUSH_BYTES = 256
+    FLUSH_NS = 30_000_000  # 30 ms — still reads as a live stream
+
+    def __init__(self, stream=None) -> None:
+        self._stream = stream or sys.stdout
+        self._raw = getattr(self._stream, "buffer", None)
+        self._encoding = getattr(self._stream, "encoding", None) or "utf-8"
+        self._buf = bytearray()
+        # Anything Rich printed so far went through the text layer.
+        self._stream.flush()
+        self._last_flush_ns = time.monotonic_ns()
+
+    def feed(self, chunk: str) -> None:
+        self._buf += chunk.encode(self._encoding, errors="replace")
+        if (
+            "\n" in chunk
+            or len(self._buf) >= self.FLUSH_BYTES
+            or time.monotonic_ns() - self._last_flush_ns > self.FLUSH_NS
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            if self._raw is not None:
+                self._raw.write(self._buf)
+                self._raw.flush()
+            else:
+                self._stream.write(self._buf.decode(self._encoding, errors="replace"))
+                self._stream.flush()
+            self._buf.clear()
+        self._last_flush_ns = time.monotonic_ns()
+
+
+def _page_label(meta: dict, fmt: str) -> str:
+    """*fmt* filled with the chunk's page, or "" when it has none."""
+    # Page 0 is a real page (pypdf is 0-based), only ""/None mean "no page".
+    page = meta.get("page")
+    return "" if page in ("", None) else fmt.format(page)
 
 
 def _format_docs(docs: list) -> str:
-    parts = []
-    for doc in docs:
-        src = doc.metadata.get("source", "unknown")
-        page = doc.metadata.get("page", "")
-        loc = f"{src}, p.{page}" if page != "" else src
-        parts.append(f"[{loc}]\n{doc.page_content}")
-    return "\n\n---\n\n".join(parts)
+    # One list comprehension + join (join on a list skips the generator hop).
+    return "\n\n---\n\n".join([
+        f"[{(meta := doc.metadata).get('source', 'unknown')}{_page_label(meta, ', p.{}')}]\n"
+        f"{doc.page_content}"
+        for doc in docs
+    ])
+
 
+_QUERY_CACHE_SIZE = 512
+_query_vectors: "OrderedDict[tuple[str, str], list[float]]" = OrderedDict()
+_query_pending: "dict[tuple[str, str], Future]" = {}
+_query_lock = threading.Lock()
 
-def _build_chain(collection: str):
+
+class _CachedOllamaEmbeddings(OllamaEmbeddings):
+    """
+    OllamaEmbeddings that memoizes embed_query() per (model, question) in a
+    small process-wide LRU. The question embedding does not depend on the LLM,
+    so `compare` embeds each question once whatever the number of models, and
+    a repeated REPL question skips the Ollama round-trip.
+
+    `compare` asks for the same question from several threads at once: the
+    first caller embeds it and the others wait on its Future, while
+    different questions still embed in parallel (the lock only guards the
+    dicts, never the Ollama request).
+    Disable with RAG_EMBED_CACHE=0 or --no-embed-cache.
+    """
+
+    def embed_query(self, text: str) -> list[float]:
+        if not config.EMBED_CACHE:
+            return super().embed_query(text)
+        key = (self.model, text)
+        with _query_lock:
+            vector = _query_vectors.get(key)
+            if vector is not None:
+                _query_vectors.move_to_end(key)
+                return vector
+            pending = _query_pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = _query_pending[key] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            vector = super().embed_query(text)
+        except BaseException as e:
+            with _query_lock:
+                del _query_pending[key]
+            pending.set_exception(e)
+            raise
+        with _query_lock:
+            del _query_pending[key]
+            _query_vectors[key] = vector
+            if len(_query_vectors) > _QUERY_CACHE_SIZE:
+                _query_vectors.popitem(last=False)
+        pending.set_result(vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        # Route through the cached sync path (off the event loop) so async
+        # retrieval shares the same cache and lock.
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+# lru_cache alone lets concurrent callers (compare's per-model threads, the
+# REPL warm-up thread) all miss and each load the same index; the lock makes
+# it one FAISS load per collection.
+_load_lock = threading.Lock()
+
+
+def _load_vectorstore(collection: str, embed_model: str) -> FAISS:
+    with _load_lock:
+        return _read_vectorstore(collection, embed_model)
+
+
+@functools.lru_cache(maxsize=8)
+def _read_vectorstore(collection: str, embed_model: str) -> FAISS:
     collection_dir = config.INDEX_DIR / collection
-    if not collection_dir.exists():
+    if not (collection_dir / "index.faiss").exists():
         raise FileNotFoundError(
             f"No index found for collection '{collection}'. Run 'index' first."
         )
 
-    embeddings = OllamaEmbeddings(model=config.EMBED_MODEL)
-    vectorstore = FAISS.load_local(
-        str(collection_dir), embeddings, allow_dangerous_deserialization=True
+    embeddings = _CachedOllamaEmbeddings(model=embed_model)
+
+    # Same files FAISS.save_local() writes, but the index is memory-mapped
+    # read-only: vectors are paged in on demand and shared through the page
+    # cache instead of being copied into every process that queries.
+    index_file = str(collection_dir / "index.faiss")
+    try:
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Index types without mmap support are read normally.
+        index = faiss.read_index(index_file)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.FAISS_NPROBE
+    elif isinstance(index, faiss.IndexHNSW):
+        # Must cover MMR's fetch_k candidates.
+        index.hnsw.efSearch = max(config.TOP_K * 3, 64)
+    index = _to_gpu(index)
+    with open(collection_dir / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
     )
 
-    retriever = vectorstore.as_retriever(
+
+@functools.lru_cache(maxsize=1)
+def _gpu_resources():
+    # One allocator (scratch memory, CUDA streams) shared by every index.
+    return faiss.StandardGpuResources()
+
+
+def _to_gpu(index):
+    """
+    Copy *index* to GPU 0 when RAG_FAISS_GPU is on and faiss was built with
+    CUDA (faiss-gpu); otherwise, or for index types faiss cannot move (HNSW),
+    return it unchanged.
+    """
+    if not config.FAISS_GPU or isinstance(index, faiss.IndexHNSW):
+        return index
+    get_num_gpus = getattr(faiss, "get_num_gpus", None)  # absent in faiss-cpu
+    if get_num_gpus is None or get_num_gpus() == 0:
+        return index
+    try:
+        return faiss.index_cpu_to_gpu(_gpu_resources(), 0, index)
+    except RuntimeError:
+        return index
+
+
+@functools.lru_cache(maxsize=8)
+def _get_retriever(collection: str, embed_model: str):
+    vectorstore = _load_vectorstore(collection, embed_model)
+    if config.SEARCH_TYPE == "similarity":
+        # Single nearest-neighbour search, no MMR re-ranking: fastest, but may
+        # return near-duplicate chunks.
+        return vectorstore.as_retriever(search_kwargs={"k": config.TOP_K})
+    return vectorstore.as_retriever(
         search_type="mmr",
-        search_kwargs={"k": config.TOP_K, "fetch_k": config.TOP_K * 3},
+        search_kwargs={
+            "k": config.TOP_K,
+            "fetch_k": config.TOP_K * 3,
+            "lambda_mult": config.MMR_LAMBDA,
+        },
     )
 
-    llm = ChatOllama(model=config.LLM_MODEL, temperature=0)
 
-    chain = (
-        {"context": retriever | _format_docs, "question": RunnablePassthrough()}
-        | _PROMPT
-        | llm
-        | StrOutputParser()
-    )
+@functools.lru_cache(maxsize=8)
+def _build_chain(collection: str, llm_model: str, embed_model: str):
+    """
+    Build the retriever and the answer chain for *collection* / *llm_model*.
+    Cached per process so the REPL and `compare` reuse the loaded index and
+    Ollama clients instead of rebuilding them on every question.
+
+    The chain takes ``{"context", "question"}``: callers run the retriever
+    themselves so the same docs can feed the prompt and the sources listing.
+    """
+    retriever = _get_retriever(collection, embed_model)
+
+    llm = ChatOllama(model=llm_model, temperature=0, keep_alive=config.KEEP_ALIVE)
+
+    prompt = RunnableLambda(_fast_prompt) if config.FAST_PROMPT else _PROMPT
+    chain = prompt | llm | StrOutputParser()
     return chain, retriever
 
 
-def query(question: str, collection: str | None = None, show_sources: bool = False) -> str:
+_warmed: set[str] = set()  # models warmup() has been tried for, even if it failed
+
+
+def warmup(collection: str | None = None, model: str | None = None) -> None:
+    """
+    Load the collection index and have Ollama load *model* and the embedding
+    model into memory, so the next question pays for none of them. Run in the
+    background by the CLI (at start-up and while the REPL waits for input)
+    and by run_silent(); failures are left for the real query to report.
+    """
+    from ollama import Client
+
+    collection = collection or config.COLLECTION
+    model = model or config.LLM_MODEL
+    try:
+        _build_chain(collection, model, config.EMBED_MODEL)
+        client = Client()
+        # Empty prompt / input loads the model without doing any work.
+        client.generate(model=model, prompt="", keep_alive=config.KEEP_ALIVE)
+        client.embed(model=config.EMBED_MODEL, input="", keep_alive=config.KEEP_ALIVE)
+    except Exception:
+        pass
+    finally:
+        # A model that failed to warm up (not pulled, Ollama down) would fail
+        # again on every compare question; the real call reports the error.
+        _warmed.add(model)
+
+
+def query(
+    question: str,
+    collection: str | None = None,
+    show_sources: bool = False,
+    model: str | None = None,
+    on_chunk: Callable[[str], None] | None = None,
+) -> str:
+    """
+    Answer *question*, streaming it to the terminal, and return the full text.
+    *on_chunk*, if given, also receives every streamed chunk (used to start
+    TTS before the answer is complete).
+    """
+    return _run_in_loop(_aquery(question, collection, show_sources, model, on_chunk))
+
+
+# The cached ChatOllama holds one httpx AsyncClient whose keep-alive
+# connections belong to the loop that opened them, so every query() runs on
+# this one long-lived loop instead of a fresh asyncio.run() loop per question.
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _run_in_loop(coro):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    task = _loop.create_task(coro)
+    try:
+        return _loop.run_until_complete(task)
+    except BaseException:
+        # Ctrl-C: cancel the stream so it cannot resume on the next question.
+        task.cancel()
+        try:
+            _loop.run_until_complete(task)
+        except BaseException:
+            pass
+        raise
+
+
+async def _aquery(
+    question: str,
+    collection: str | None,
+    show_sources: bool,
+    model: str | None,
+    on_chunk: Callable[[str], None] | None,
+) -> str:
+    """
+    Async body of query(): tokens come from chain.astream(), so reading the
+    next token off the Ollama socket overlaps with echoing the previous one.
+    """
     collection = collection or config.COLLECTION
 
     try:
-        chain, retriever = _build_chain(collection)
+        chain, retriever = _build_chain(collection, model or config.LLM_MODEL, config.EMBED_MODEL)
     except FileNotFoundError as e:
         console.print(f"[red]{e}[/red]")
         return ""
@@ -74,24 +362,29 @@ def query(question: str, collection: str | None = None, show_sources: bool = Fal
     console.print(f"\n[bold blue]Q:[/bold blue] {question}\n")
     console.print("[bold green]A:[/bold green] ", end="")
 
-    full_response = ""
+    parts: list[str] = []
+    streamer = _TokenStreamer()
     try:
-        for chunk in chain.stream(question):
-            print(chunk, end="", flush=True)
-            full_response += chunk
+        docs = await retriever.ainvoke(question)
+        inputs = {"context": _format_docs(docs), "question": question}
+        async for chunk in chain.astream(inputs):
+            streamer.feed(chunk)
+            parts.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
     except Exception as e:
+        streamer.flush()
         console.print(f"\n[red]Error during generation: {e}[/red]")
-        return full_response
+        return "".join(parts)
 
-    print()
+    streamer.feed("\n")
+    full_response = "".join(parts)
 
     if show_sources:
-        docs = retriever.invoke(question)
         console.print("\n[dim]── Sources ──────────────────────────────[/dim]")
         for i, doc in enumerate(docs, 1):
-            src = doc.metadata.get("source", "unknown")
-            page = doc.metadata.get("page", "")
-            loc = f"{src} (p.{page})" if page != "" else src
+            meta = doc.metadata
+            loc = f"{meta.get('source', 'unknown')}{_page_label(meta, ' (p.{})')}"
             preview = doc.page_content[:120].replace("\n", " ")
             console.print(f"  [dim]{i}. {loc}[/dim]")
             console.print(f"     [dim italic]\"{preview}…\"[/dim italic]")
@@ -107,14 +400,86 @@ def run_silent(
     Returns (answer, elapsed_seconds). Used by the `compare` command.
     """
     collection = collection or config.COLLECTION
-    original_model = config.LLM_MODEL
-    if model:
-        config.LLM_MODEL = model
+    model = model or config.LLM_MODEL
+    chain, retriever = _build_chain(collection, model, config.EMBED_MODEL)
+    if model not in _warmed:
+        # Keep the one-off model load out of the measured latency.
+        warmup(collection, model)
+    start = time.perf_counter()
+    docs = retriever.invoke(question)
+    result = chain.invoke({"context": _format_docs(docs), "question": question})
+    elapsed = time.perf_counter() - start
+    return result, elapsed
+
+
+def run_batch(
+    pairs: list[tuple[str, str]],
+    on_result: Callable[[int, str, float], None],
+    collection: str | None = None,
+) -> None:
+    """
+    Answer every (question, model) pair against the OpenAI-compatible server
+    at ``config.OPENAI_BASE_URL`` (e.g. vLLM), all in flight at once up to
+    ``config.MAX_CONCURRENCY`` so the server can batch them together.
+    Retrieval still runs locally, once per distinct question.
+
+    ``on_result(i, answer, elapsed_seconds)`` is called for ``pairs[i]`` as
+    soon as it completes, so results arrive in completion order. A failed
+    request yields an ``"ERROR: …"`` answer, as in `compare`'s Ollama path;
+    a failed retrieval raises RuntimeError, a missing collection
+    FileNotFoundError. Used by the `compare` command.
+    """
+    asyncio.run(_arun_batch(pairs, on_result, collection or config.COLLECTION))
+
+
+async def _arun_batch(
+    pairs: list[tuple[str, str]],
+    on_result: Callable[[int, str, float], None],
+    collection: str,
+) -> None:
+    try:
+        from openai import AsyncOpenAI  # type: ignore
+    except ImportError:
+        raise RuntimeError("openai is not installed. Run: pip install openai")
+
+    retriever = _get_retriever(collection, config.EMBED_MODEL)
+    semaphore = asyncio.Semaphore(config.MAX_CONCURRENCY)
+
+    async def build_prompt(question: str) -> str:
+        async with semaphore:
+            try:
+                docs = await retriever.ainvoke(question)
+            except Exception as e:
+                raise RuntimeError(f"Retrieval failed for {question!r}: {e}") from e
+        return _render_prompt(_format_docs(docs), question)
+
+    # One retrieval per distinct question, shared by all of its models.
+    prompts = {
+        q: asyncio.ensure_future(build_prompt(q))
+        for q in dict.fromkeys(q for q, _ in pairs)
+    }
+
+    client = AsyncOpenAI(base_url=config.OPENAI_BASE_URL, api_key=config.OPENAI_API_KEY)
+
+    async def ask(i: int, question: str, model: str) -> None:
+        # Awaited outside the semaphore: retrieval takes its own slot.
+        prompt = await prompts[question]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                resp = await client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                )
+            except Exception as e:
+                answer, elapsed = f"ERROR: {e}", 0.0
+            else:
+                answer = resp.choices[0].message.content or ""
+                elapsed = time.perf_counter() - start
+        on_result(i, answer, elapsed)
+
     try:
-        chain, _ = _build_chain(collection)
-        start = time.perf_counter()
-        result = chain.invoke(question)
-        elapsed = time.perf_counter() - start
-        return result, elapsed
+        await asyncio.gather(*(ask(i, q, m) for i, (q, m) in enumerate(pairs)))
     finally:
-        config.LLM_MODEL = original_model
+        await client.close()
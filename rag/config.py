@@ -1,13 +1,63 @@
 import os
+import re
 from pathlib import Path
 
+# Size tags of untagged default models, so RAG_PRECISION can address a variant.
+_DEFAULT_TAGS = {"llama3.2": "3b-instruct", "mistral": "7b-instruct"}
+_QUANT_SUFFIX = re.compile(r"-(q\d\w*|fp16|f16|bf16)$", re.IGNORECASE)
+
+
+def _with_precision(model: str, precision: str) -> str:
+    """
+    Point an Ollama model at its *precision* quantization tag, e.g.
+    ``llama3.2`` + ``q8_0`` → ``llama3.2:3b-instruct-q8_0``. Only tags whose
+    quantized names are known are rewritten: the _DEFAULT_TAGS models (bare
+    or with their default tag) and tags that already end in a quantization
+    suffix, which is replaced. Anything else (``llama3.2:1b``, custom
+    models) is left unchanged, since Ollama does not publish ``<size>-q8_0``.
+    """
+    if not precision:
+        return model
+    name, _, tag = model.partition(":")
+    quant = _QUANT_SUFFIX.search(tag)
+    if quant:
+        tag = tag[: quant.start()]
+    elif tag in ("", "latest") or tag == _DEFAULT_TAGS.get(name):
+        tag = _DEFAULT_TAGS.get(name, "")
+    else:
+        return model
+    if not tag:
+        return model
+    return f"{name}:{tag}-{precision}"
+
+
 # Ollama models
+# Ollama's default llama3.2 tag is already 4-bit (Q4_K_M); RAG_PRECISION=q8_0
+# trades some speed for quality, fp16 for full precision. Applies to
+# RAG_LLM_MODEL only; --model and compare's --models are used as given.
+PRECISION: str = os.getenv("RAG_PRECISION", "")  # e.g. "q4_K_M" | "q8_0" | "fp16"
 EMBED_MODEL: str = os.getenv("RAG_EMBED_MODEL", "nomic-embed-text")
-LLM_MODEL: str = os.getenv("RAG_LLM_MODEL", "llama3.2")
+LLM_MODEL: str = _with_precision(os.getenv("RAG_LLM_MODEL", "llama3.2"), PRECISION)
+
+# Generation
+# How long Ollama keeps a model loaded after a request: a duration ("30m",
+# "1h") or plain seconds ("3600", "-1" = forever). Ollama reads a string as
+# a Go duration, where "-1" has no unit, so bare numbers are sent as ints.
+_keep_alive = os.getenv("RAG_KEEP_ALIVE", "30m")
+KEEP_ALIVE: str | int = int(_keep_alive) if re.fullmatch(r"-?\d+", _keep_alive) else _keep_alive
+FAST_PROMPT: bool = os.getenv("RAG_FAST_PROMPT", "1") != "0"  # 0 = use ChatPromptTemplate
+
+# Optional OpenAI-compatible server (e.g. vLLM) used by `compare` when set
+OPENAI_BASE_URL: str = os.getenv("RAG_OPENAI_BASE_URL", "")
+OPENAI_API_KEY: str = os.getenv("RAG_OPENAI_API_KEY", "EMPTY")
+MAX_CONCURRENCY: int = int(os.getenv("RAG_MAX_CONCURRENCY", "16"))
 
 # FAISS persistence — each collection is a subdirectory
 INDEX_DIR: Path = Path(os.getenv("RAG_INDEX_DIR", "./faiss_db"))
 COLLECTION: str = os.getenv("RAG_COLLECTION", "default")
+FAISS_INDEX_TYPE: str = os.getenv("RAG_FAISS_INDEX_TYPE", "flat")  # "flat" | "sq8" | "ivfpq" | "hnsw"
+FAISS_NPROBE: int = int(os.getenv("RAG_FAISS_NPROBE", "16"))  # IVF lists scanned per query
+FAISS_GPU: bool = os.getenv("RAG_FAISS_GPU", "1") != "0"  # search on the GPU when faiss-gpu is installed
 
 # Output directory for saved answers and compare results
 OUTPUT_DIR: Path = Path(os.getenv("RAG_OUTPUT_DIR", "./output"))
@@ -16,8 +66,17 @@ OUTPUT_DIR: Path = Path(os.getenv("RAG_OUTPUT_DIR", "./output"))
 CHUNK_SIZE: int = int(os.getenv("RAG_CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP: int = int(os.getenv("RAG_CHUNK_OVERLAP", "200"))
 
+# Embedding
+EMBED_BATCH: int = int(os.getenv("RAG_EMBED_BATCH", "64"))  # chunks per /api/embed request
+CHUNK_CACHE: bool = os.getenv("RAG_CHUNK_CACHE", "1") != "0"  # reuse vectors of unchanged chunks on re-index
+EMBED_CONCURRENCY: int = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))  # batches in flight at once
+STREAMING_THRESHOLD: int = int(os.getenv("RAG_STREAMING_THRESHOLD", "1000"))  # files; pipeline load/embed above this
+
 # Retrieval
 TOP_K: int = int(os.getenv("RAG_TOP_K", "5"))
+SEARCH_TYPE: str = os.getenv("RAG_SEARCH_TYPE", "mmr")  # "mmr" (diverse) | "similarity" (fastest)
+MMR_LAMBDA: float = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))  # 1 = pure relevance, 0 = max diversity
+EMBED_CACHE: bool = os.getenv("RAG_EMBED_CACHE", "1") != "0"  # memoize question embeddings
 
 # TTS
 TTS_VOICE: str = os.getenv("RAG_TTS_VOICE", "it-IT-ElsaNeural")
@@ -0,0 +1,78 @@
+"""
+Persistent chunk-embedding cache for the indexer.
+
+Vectors are stored in one SQLite file at the top of INDEX_DIR, shared by
+every collection and keyed by embedding model + a blake2b hash of the chunk
+text. It outlives `clear --collection`, so clearing a collection and
+indexing the folder again only sends new or changed chunks to Ollama.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from array import array
+from pathlib import Path
+from typing import Optional
+
+_LOOKUP_CHUNK = 500  # stay well below SQLite's bound-parameter limit
+
+
+def _key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbedCache:
+    """
+    ``(embed model, chunk text) → vector`` map backed by SQLite.
+
+    Vectors are stored as float32, the precision FAISS keeps anyway.
+    Use as a context manager so pending writes are committed and the
+    connection closed.
+    """
+
+    def __init__(self, path: Path, model: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._model = model
+        self._db = sqlite3.connect(str(path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+
+    def get_many(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """Cached vector for each text, or None where there is none."""
+        keys = [_key(t) for t in texts]
+        found: dict[str, bytes] = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            batch = keys[start:start + _LOOKUP_CHUNK]
+            rows = self._db.execute(
+                f"SELECT key, vec FROM vectors WHERE model = ? AND key IN"
+                f" ({','.join('?' * len(batch))})",
+                [self._model, *batch],
+            )
+            found.update(rows)
+        return [_decode(found[k]) if k in found else None for k in keys]
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO vectors (model, key, vec) VALUES (?, ?, ?)",
+            [(self._model, _key(t), array("f", v).tobytes()) for t, v in zip(texts, vectors)],
+        )
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self) -> "EmbedCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _decode(blob: bytes) -> list[float]:
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
@@ -1,7 +1,14 @@
+import contextlib
 import json
+import math
+import os
+import queue
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
+import faiss
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
@@ -9,9 +16,15 @@ from langchain_community.vectorstores import FAISS
 from rich.console import Console
 
 from . import config
+from .embed_cache import EmbedCache
 
 console = Console()
 
+_LOAD_WORKERS = min(8, os.cpu_count() or 1)
+_RING_SIZE = 4  # embed batches buffered between loaders and the embedder
+_EMBED_CACHE_FILE = ".embed_cache.sqlite"  # shared by every collection
+_INDEX_TYPES = ("flat", "sq8", "ivfpq", "hnsw")
+
 LOADERS = {
     ".pdf": PyPDFLoader,
     ".txt": TextLoader,
@@ -39,56 +52,389 @@ def _load_file(path: Path) -> list:
         return []
 
 
-def load_documents(path: Path) -> list:
+def _list_files(path: Path) -> list[Path]:
+    return sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in LOADERS)
+
+
+def load_documents(path: Path, files: list[Path] | None = None) -> list:
     if path.is_file():
         return _load_file(path)
     docs = []
-    files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in LOADERS)
+    files = _list_files(path) if files is None else files
     if not files:
         console.print(f"[yellow]No supported files found in {path}[/yellow]")
         return []
-    for f in files:
-        docs.extend(_load_file(f))
+    # Parsing (pypdf, docx2txt) and disk reads overlap across files. ex.map
+    # keeps the documents in file order; each file logs a single console.print,
+    # which Rich serializes, so lines never interleave.
+    with ThreadPoolExecutor(max_workers=_LOAD_WORKERS) as ex:
+        for file_docs in ex.map(_load_file, files):
+            docs.extend(file_docs)
     return docs
 
 
+# Batch size that last worked; lowered for the rest of the run when Ollama
+# times out or errors on a batch (0 = use config.EMBED_BATCH).
+_embed_batch_size = 0
+
+
+def _embed_cached(
+    embeddings: OllamaEmbeddings, texts: list[str], cache: EmbedCache | None
+) -> tuple[list[list[float]], int]:
+    """
+    Embed *texts*, taking vectors for unchanged chunks from *cache* and
+    sending only the misses to Ollama; new vectors are written back.
+    Identical texts (repeated PDF headers/footers) are embedded once and
+    the vector is shared by every occurrence.
+    Returns (vectors in input order, number reused from the cache).
+    """
+    slots: dict[str, int] = {}
+    order = [slots.setdefault(t, len(slots)) for t in texts]
+    unique = list(slots)
+
+    if cache is None:
+        vectors, reused = _embed_sorted(embeddings, unique), 0
+    else:
+        vectors = cache.get_many(unique)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            miss_texts = [unique[i] for i in missing]
+            fresh = _embed_sorted(embeddings, miss_texts)
+            cache.put_many(miss_texts, fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        reused = len(unique) - len(missing)
+    return [vectors[i] for i in order], reused
+
+
+def _embed_sorted(embeddings: OllamaEmbeddings, texts: list[str]) -> list[list[float]]:
+    """
+    Embed *texts* shortest-first so every batch holds chunks of similar
+    length and the model pads less, then return the vectors in the
+    original order.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_vectors = _embed_chunks(embeddings, [texts[i] for i in order])
+    vectors: list[list[float]] = [[]] * len(texts)
+    for i, vector in zip(order, sorted_vectors):
+        vectors[i] = vector
+    return vectors
+
+
+def _embed_chunks(
+    embeddings: OllamaEmbeddings, texts: list[str], workers: int | None = None
+) -> list[list[float]]:
+    """
+    Embed *texts* in batches of EMBED_BATCH. embed_documents() sends a whole
+    batch to Ollama's /api/embed in a single request, so N chunks cost
+    N / EMBED_BATCH round-trips over one kept-alive client.
+
+    Up to *workers* (default EMBED_CONCURRENCY) batches are in flight at
+    once, which lets an Ollama server with OLLAMA_NUM_PARALLEL > 1 work on
+    several of them together. Run sequentially, the batch size is re-read
+    every iteration because _embed_batch() may lower it.
+    """
+    workers = max(1, config.EMBED_CONCURRENCY if workers is None else workers)
+    size = _embed_batch_size or max(1, config.EMBED_BATCH)
+    if workers > 1 and len(texts) > size:
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as ex:
+            results = ex.map(lambda batch: _embed_batch(embeddings, batch), batches)
+            return [vector for out in results for vector in out]
+
+    vectors: list[list[float]] = []
+    start = 0
+    while start < len(texts):
+        size = _embed_batch_size or max(1, config.EMBED_BATCH)
+        batch = texts[start:start + size]
+        vectors.extend(_embed_batch(embeddings, batch))
+        start += len(batch)
+    return vectors
+
+
+def _embed_batch(embeddings: OllamaEmbeddings, batch: list[str]) -> list[list[float]]:
+    """Embed one batch, halving it and retrying if Ollama is overloaded."""
+    global _embed_batch_size
+    try:
+        out = embeddings.embed_documents(batch)
+    except Exception as e:
+        if len(batch) == 1 or not _is_overload(e):
+            raise
+        half = len(batch) // 2
+        if not _embed_batch_size or half < _embed_batch_size:
+            _embed_batch_size = half
+            console.print(
+                f"  [yellow]Embedding batch of {len(batch)} failed ({type(e).__name__}),"
+                f" retrying with batches of {half}[/yellow]"
+            )
+        # Retry sequentially: piling on more concurrent requests would not
+        # help a server that is already struggling.
+        return _embed_chunks(embeddings, batch, workers=1)
+
+    if len(out) != len(batch):
+        # Vectors are matched to chunks by position; never store a misaligned batch.
+        raise ValueError(
+            f"Ollama returned {len(out)} embeddings for a batch of {len(batch)} chunks"
+        )
+    return out
+
+
+def _is_overload(e: Exception) -> bool:
+    """Timeouts and 5xx responses are worth retrying with a smaller batch."""
+    import httpx
+    from ollama import ResponseError
+
+    if isinstance(e, ResponseError):
+        return e.status_code >= 500
+    return isinstance(e, (httpx.TimeoutException, httpx.RemoteProtocolError))
+
+
+def _add_to_store(
+    vectorstore: FAISS | None,
+    embeddings: OllamaEmbeddings,
+    chunks: list,
+    vectors: list[list[float]],
+) -> FAISS:
+    """Add pre-computed chunk vectors to *vectorstore*, creating it if None."""
+    text_embeddings = list(zip((c.page_content for c in chunks), vectors))
+    metadatas = [c.metadata for c in chunks]
+    if vectorstore is None:
+        return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+    return vectorstore
+
+
+# k-means training points faiss asks for per centroid; each 8-bit PQ
+# codebook has 256 centroids, so smaller collections stay flat.
+_KMEANS_MIN_POINTS = 39
+_IVFPQ_MIN_TRAIN = _KMEANS_MIN_POINTS * 256
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest PQ sub-quantizer count <= 64 that divides *dim*."""
+    return next(m for m in range(min(64, dim), 0, -1) if dim % m == 0)
+
+
+def _build_index(vectorstore: FAISS) -> None:
+    """
+    Rebuild a freshly created (flat) store's index as RAG_FAISS_INDEX_TYPE.
+
+    ``sq8`` stores every component as one byte (4× smaller than float32);
+    ``ivfpq`` clusters the vectors and product-quantizes them to 64 bytes, so
+    a query scans a few lists of compressed codes instead of every float.
+    ``hnsw`` keeps full vectors in a navigable graph for roughly logarithmic
+    search time (no training; vectors cannot be removed, re-index instead).
+    Collections too small to train a quantizer stay flat. Merges into an
+    existing collection keep whatever index type it was built with.
+    """
+    kind = config.FAISS_INDEX_TYPE
+    flat = vectorstore.index
+    n, dim = flat.ntotal, flat.d
+    if kind == "flat" or n == 0:
+        return
+
+    if kind == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, flat.metric_type)
+    elif kind == "ivfpq":
+        if n < _IVFPQ_MIN_TRAIN:
+            console.print(
+                f"[yellow]Only {n} chunks — too few to train an IVF-PQ index"
+                f" (needs {_IVFPQ_MIN_TRAIN}), keeping a flat index.[/yellow]"
+            )
+            return
+        # faiss wants ~39 training points per centroid, coarse lists included.
+        nlist = min(4096, 4 * int(math.sqrt(n)), n // _KMEANS_MIN_POINTS)
+        index = faiss.IndexIVFPQ(
+            faiss.IndexFlat(dim, flat.metric_type), dim, nlist, _pq_subquantizers(dim), 8,
+            flat.metric_type,
+        )
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32, flat.metric_type)
+        index.hnsw.efConstruction = 200
+    else:
+        raise ValueError(f"Unknown RAG_FAISS_INDEX_TYPE: {kind!r}")
+
+    vectors = flat.reconstruct_n(0, n)
+    index.train(vectors)
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        # MMR re-ranking reconstructs the fetched vectors by id.
+        index.make_direct_map()
+    vectorstore.index = index
+    console.print(f"[dim]Built {kind} index ({n} vectors, dim {dim})[/dim]")
+
+
+def _index_type(index) -> str:
+    """The RAG_FAISS_INDEX_TYPE name an index was built as."""
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def _index_streaming(
+    files: list[Path],
+    splitter: RecursiveCharacterTextSplitter,
+    embeddings: OllamaEmbeddings,
+    vectorstore: FAISS | None,
+    cache: EmbedCache | None,
+) -> tuple[FAISS | None, int, int, set[str]]:
+    """
+    Two-stage pipeline for large folders: a thread pool loads and splits
+    files into a bounded queue while this thread drains it EMBED_BATCH chunks
+    at a time into Ollama and FAISS, so embedding starts with the first batch
+    instead of after every file has been parsed. The queue holds at most
+    _RING_SIZE batches, which makes the loaders wait when embedding lags.
+
+    Returns (vectorstore, chunks added, vectors reused from *cache*,
+    source file names).
+    """
+    batch_size = max(1, config.EMBED_BATCH)
+    pending: queue.Queue = queue.Queue(maxsize=_RING_SIZE * batch_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> None:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce(f: Path) -> None:
+        if stop.is_set():
+            return
+        for chunk in splitter.split_documents(_load_file(f)):
+            if stop.is_set():
+                return
+            put(chunk)
+
+    loaders = ThreadPoolExecutor(max_workers=_LOAD_WORKERS)
+
+    def feed() -> None:
+        try:
+            for _ in loaders.map(produce, files):
+                pass
+        except CancelledError:
+            pass  # embedding failed or was interrupted; see the finally below
+        finally:
+            put(done)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    added = reused = 0
+    sources: set[str] = set()
+    batch: list = []
+    try:
+        while True:
+            item = pending.get()
+            if item is not done:
+                batch.append(item)
+            if batch and (item is done or len(batch) >= batch_size):
+                vectors, hits = _embed_cached(embeddings, [c.page_content for c in batch], cache)
+                reused += hits
+                vectorstore = _add_to_store(vectorstore, embeddings, batch, vectors)
+                added += len(batch)
+                sources.update(Path(c.metadata.get("source", "?")).name for c in batch)
+                batch = []
+            if item is done:
+                break
+    finally:
+        # On an embedding error or Ctrl-C, drop files not yet loaded instead
+        # of parsing the rest of the folder before the error surfaces.
+        stop.set()
+        loaders.shutdown(cancel_futures=True)
+        feeder.join()
+    return vectorstore, added, reused, sources
+
+
 def index(path: Path, collection: str | None = None) -> int:
     collection = collection or config.COLLECTION
     collection_dir = config.INDEX_DIR / collection
 
-    console.print(f"\n[bold blue]Indexing[/bold blue] {path}")
-
-    docs = load_documents(path)
-    if not docs:
-        console.print("[red]No documents loaded — nothing to index.[/red]")
+    # Checked up front: _build_index only runs after every chunk is embedded.
+    if config.FAISS_INDEX_TYPE not in _INDEX_TYPES:
+        console.print(
+            f"[red]Unknown RAG_FAISS_INDEX_TYPE: {config.FAISS_INDEX_TYPE!r}"
+            f" (expected one of: {', '.join(_INDEX_TYPES)})[/red]"
+        )
         return 0
 
-    console.print(f"\n[green]Loaded {len(docs)} raw chunks[/green]")
+    console.print(f"\n[bold blue]Indexing[/bold blue] {path}")
 
+    files = None if path.is_file() else _list_files(path)
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=config.CHUNK_SIZE,
         chunk_overlap=config.CHUNK_OVERLAP,
         add_start_index=True,
     )
-    chunks = splitter.split_documents(docs)
-    console.print(f"[green]Split into {len(chunks)} text chunks[/green]")
-
-    console.print(
-        f"\n[bold]Embedding with [cyan]{config.EMBED_MODEL}[/cyan]"
-        f" (this may take a while the first time)...[/bold]"
-    )
-
     embeddings = OllamaEmbeddings(model=config.EMBED_MODEL)
 
-    if collection_dir.exists():
+    vectorstore = None
+    merging = (collection_dir / "index.faiss").exists()
+    if merging:
         # Merge into existing index
         vectorstore = FAISS.load_local(
             str(collection_dir), embeddings, allow_dangerous_deserialization=True
         )
-        vectorstore.add_documents(chunks)
+
+    cache = (
+        EmbedCache(config.INDEX_DIR / _EMBED_CACHE_FILE, config.EMBED_MODEL)
+        if config.CHUNK_CACHE
+        else None
+    )
+    with cache or contextlib.nullcontext():
+        if files and len(files) >= config.STREAMING_THRESHOLD:
+            console.print(
+                f"\n[bold]Streaming {len(files)} files into [cyan]{config.EMBED_MODEL}[/cyan]"
+                f" (this may take a while the first time)...[/bold]"
+            )
+            vectorstore, added, reused, sources = _index_streaming(
+                files, splitter, embeddings, vectorstore, cache
+            )
+            if not added:
+                console.print("[red]No documents loaded — nothing to index.[/red]")
+                return 0
+        else:
+            docs = load_documents(path, files)
+            if not docs:
+                console.print("[red]No documents loaded — nothing to index.[/red]")
+                return 0
+
+            console.print(f"\n[green]Loaded {len(docs)} raw chunks[/green]")
+
+            chunks = splitter.split_documents(docs)
+            console.print(f"[green]Split into {len(chunks)} text chunks[/green]")
+
+            console.print(
+                f"\n[bold]Embedding with [cyan]{config.EMBED_MODEL}[/cyan]"
+                f" (this may take a while the first time)...[/bold]"
+            )
+
+            # One batched embedding pass, then a single index.add() of the whole
+            # float32 matrix — for new and existing collections alike.
+            vectors, reused = _embed_cached(embeddings, [c.page_content for c in chunks], cache)
+            vectorstore = _add_to_store(vectorstore, embeddings, chunks, vectors)
+            added = len(chunks)
+            sources = {Path(c.metadata.get("source", "?")).name for c in chunks}
+
+    if reused:
+        console.print(f"[dim]Reused {reused} cached embeddings (unchanged chunks)[/dim]")
+    if merging:
         console.print(f"[dim]Merged into existing collection '{collection}'[/dim]")
+        existing = _index_type(vectorstore.index)
+        if existing != config.FAISS_INDEX_TYPE:
+            console.print(
+                f"[dim]Kept its {existing} index — RAG_FAISS_INDEX_TYPE={config.FAISS_INDEX_TYPE}"
+                f" only applies to new collections (clear and re-index to change it)[/dim]"
+            )
     else:
-        vectorstore = FAISS.from_documents(chunks, embeddings)
+        _build_index(vectorstore)
 
     collection_dir.mkdir(parents=True, exist_ok=True)
     vectorstore.save_local(str(collection_dir))
@@ -96,17 +442,16 @@ def index(path: Path, collection: str | None = None) -> int:
     total = vectorstore.index.ntotal
 
     # Persist lightweight metadata for the `list` command
-    sources = sorted({str(Path(c.metadata.get("source", "?")).name) for c in chunks})
     meta = {
         "chunks": total,
-        "sources": sources,
+        "sources": sorted(sources),
         "updated": datetime.now(timezone.utc).isoformat(),
     }
     (collection_dir / "meta.json").write_text(json.dumps(meta, indent=2))
 
     console.print(
-        f"\n[bold green]✓ Indexed {len(chunks)} chunks[/bold green]"
+        f"\n[bold green]✓ Indexed {added} chunks[/bold green]"
         f" → collection [cyan]'{collection}'[/cyan]"
         f" ([dim]{collection_dir}[/dim])"
     )
-    return len(chunks)
+    return added
@@ -7,9 +7,14 @@ Linux uses ffplay/mpv.
 from __future__ import annotations
 
 import asyncio
+import io
 import os
+import queue
+import re
+import subprocess
 import sys
 import tempfile
+import threading
 from pathlib import Path
 from typing import Optional
 
@@ -39,38 +44,160 @@ def speak(
     asyncio.run(_speak_async(text, voice, save_to))
 
 
-async def _speak_async(
-    text: str, voice: str, save_to: Optional[Path]
-) -> None:
+class SpeechStream:
+    """
+    Speak text while it is still being produced (e.g. a streamed LLM answer).
+
+    ``feed()`` buffers chunks and queues every completed sentence; a background
+    thread synthesizes and plays queued sentences in order, so the first one
+    is heard while later ones are still being generated. ``close()`` queues
+    the remaining text and blocks until playback ends, re-raising any
+    RuntimeError (edge-tts missing, no audio player) from the worker.
+
+    Args:
+        voice:     edge-tts voice name; defaults to ``config.TTS_VOICE``.
+        max_chars: Stop queueing text after this many characters (0 = no limit).
+    """
+
+    _SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+    def __init__(self, voice: Optional[str] = None, max_chars: int = 0) -> None:
+        from . import config
+
+        self._voice = voice or config.TTS_VOICE
+        self._budget = max_chars or None
+        self._buf = ""
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._cancelled = threading.Event()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def feed(self, chunk: str) -> None:
+        self._buf += chunk
+        *sentences, self._buf = self._SENTENCE_END.split(self._buf)
+        for sentence in sentences:
+            self._put(sentence)
+
+    def close(self) -> None:
+        self._put(self._buf)
+        self._buf = ""
+        self._queue.put(None)
+        while self._worker.is_alive():
+            self._worker.join(0.1)  # short timeouts keep Ctrl-C responsive
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self) -> None:
+        """Drop anything not yet spoken; the current sentence finishes."""
+        self._cancelled.set()
+        self._queue.put(None)
+
+    def _put(self, text: str) -> None:
+        text = text.strip()
+        if not text or self._budget == 0:
+            return
+        if self._budget is not None:
+            text = text[: self._budget]
+            self._budget -= len(text)
+        self._queue.put(text)
+
+    def _run(self) -> None:
+        # Each sentence is synthesized while the previous one is still
+        # playing, so there is no synthesis gap between sentences.
+        playing: Optional[tuple[Optional[subprocess.Popen], str]] = None
+        try:
+            while True:
+                sentence = self._queue.get()
+                if sentence is None or self._cancelled.is_set():
+                    break
+                tmp = asyncio.run(_synthesize(sentence, self._voice))
+                if playing is not None:
+                    previous, playing = playing, None
+                    _finish(*previous)
+                try:
+                    playing = (_play(tmp, block=False), tmp)
+                except BaseException:
+                    _unlink(tmp)
+                    raise
+            if playing is not None:
+                previous, playing = playing, None
+                _finish(*previous)
+        except BaseException as e:  # surfaced by close()
+            self._error = e
+            if playing is not None:
+                _unlink(playing[1])
+
+
+def _communicate(text: str, voice: str):
     try:
         import edge_tts  # type: ignore
     except ImportError:
         raise RuntimeError(
             "edge-tts is not installed. Run: pip install edge-tts"
         )
+    return edge_tts.Communicate(text, voice)
 
-    communicate = edge_tts.Communicate(text, voice)
 
+async def _speak_async(
+    text: str, voice: str, save_to: Optional[Path]
+) -> None:
     if save_to:
         save_to = Path(save_to)
         save_to.parent.mkdir(parents=True, exist_ok=True)
-        await communicate.save(str(save_to))
+        await _communicate(text, voice).save(str(save_to))
+        return
+
+    if sys.platform not in ("win32", "darwin"):
+        await _stream_to_player(_communicate(text, voice))
         return
 
+    tmp = await _synthesize(text, voice)
+    try:
+        _play(tmp)
+    finally:
+        _unlink(tmp)
+
+
+async def _synthesize(text: str, voice: str) -> str:
+    """Synthesize *text* into a temporary MP3 and return its path."""
+    communicate = _communicate(text, voice)
     with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
         tmp = f.name
     try:
         await communicate.save(tmp)
-        _play(tmp)
-    finally:
-        try:
-            os.unlink(tmp)
-        except OSError:
-            pass
+    except BaseException:
+        _unlink(tmp)
+        raise
+    return tmp
 
 
-def _play(path: str) -> None:
-    """Play an MP3 file, blocking until playback finishes."""
+async def _stream_to_player(communicate) -> None:
+    """
+    Pipe MP3 chunks into the player's stdin as edge-tts produces them, so
+    playback starts before synthesis of a long text has finished.
+    """
+    proc = _spawn_player("-", stdin=subprocess.PIPE)
+    try:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                proc.stdin.write(chunk["data"])
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass  # player exited early; its return code is checked below
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    _finish(proc)
+
+
+def _play(path: str, block: bool = True) -> Optional[subprocess.Popen]:
+    """
+    Play an MP3 file. By default, block until playback finishes; with
+    ``block=False`` return the running player process instead (pass it to
+    ``_finish``). Windows always plays synchronously and returns None.
+    """
     if sys.platform == "win32":
         import ctypes
         mci: ctypes.CDLL = ctypes.windll.winmm  # type: ignore[attr-defined]
@@ -78,28 +205,51 @@ def _play(path: str) -> None:
         mci.mciSendStringW(f'open "{path}" type mpegvideo alias {alias}', None, 0, None)
         mci.mciSendStringW(f"play {alias} wait", None, 0, None)
         mci.mciSendStringW(f"close {alias}", None, 0, None)
-    elif sys.platform == "darwin":
-        import subprocess
-        subprocess.run(["afplay", path], check=True)
+        return None
+
+    if sys.platform == "darwin":
+        proc = subprocess.Popen(["afplay", path])
     else:
-        import subprocess
-        # Try ffplay first, fall back to mpv
-        for player in (["ffplay", "-nodisp", "-autoexit", path],
-                       ["mpv", "--no-video", path]):
-            try:
-                subprocess.run(
-                    player,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    check=True,
-                )
-                break
-            except FileNotFoundError:
-                continue
-        else:
-            raise RuntimeError(
-                "No audio player found. Install ffplay (ffmpeg) or mpv."
+        proc = _spawn_player(path)
+    if not block:
+        return proc
+    _finish(proc)
+    return None
+
+
+def _spawn_player(source: str, **kwargs) -> subprocess.Popen:
+    """Start ffplay, or mpv as a fallback, on *source* (a path or "-" for stdin)."""
+    for player in (["ffplay", "-nodisp", "-autoexit", source],
+                   ["mpv", "--no-video", source]):
+        try:
+            return subprocess.Popen(
+                player,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                **kwargs,
             )
+        except FileNotFoundError:
+            continue
+    raise RuntimeError(
+        "No audio player found. Install ffplay (ffmpeg) or mpv."
+    )
+
+
+def _finish(proc: Optional[subprocess.Popen], tmp: Optional[str] = None) -> None:
+    """Wait for a player started by ``_play``/``_spawn_player``, then drop *tmp*."""
+    try:
+        if proc is not None and proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    finally:
+        if tmp is not None:
+            _unlink(tmp)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
 
 
 # ── text extraction helpers ────────────────────────────────────────────────────
@@ -124,13 +274,25 @@ def _extract_pdf(path: Path) -> str:
         raise RuntimeError("pypdf is not installed. Run: pip install pypdf")
 
     reader = PdfReader(str(path))
-    pages = [page.extract_text() or "" for page in reader.pages]
-    return "\n\n".join(pages)
+    # Append page by page instead of collecting a list of page strings;
+    # getvalue() still copies the buffer, so peak memory is unchanged.
+    buf = io.StringIO()
+    for i, page in enumerate(reader.pages):
+        if i:
+            buf.write("\n\n")
+        buf.write(page.extract_text() or "")
+    return buf.getvalue()
 
 
 def _extract_json(path: Path) -> str:
     import json
-    data = json.loads(path.read_text(encoding="utf-8"))
+    with path.open("rb") as f:
+        try:
+            import orjson
+        except ImportError:
+            data = json.load(f)
+        else:
+            data = orjson.loads(f.read())
     # If it's the output format saved by _save_output (has "answer" key), read that.
     if isinstance(data, dict):
         parts = []